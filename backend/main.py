@@ -1,11 +1,16 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Dict, Optional, Any, Tuple
+from enum import IntEnum
+import functools
+import hashlib
 import json
+import orjson
 import asyncio
 import httpx
+import numpy as np
 from datetime import datetime
 import logging
 import os
@@ -15,11 +20,21 @@ from pathlib import Path
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Optional Numba-compiled kernels; fall back to NumPy when unavailable
+try:
+    import risk_kernels
+except Exception as e:
+    risk_kernels = None
+    logger.info(f"Numba kernels unavailable, using NumPy fallback: {e}")
+
 # Initialize FastAPI app
 app = FastAPI(
     title="GENEHIVE API",
     description="AI-powered genetic risk simulation backend",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson serializes large risk lists several times faster than the
+    # stdlib encoder and handles numpy scalars natively
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -32,15 +47,39 @@ app.add_middleware(
 )
 
 # Pydantic models
+class InheritanceType(IntEnum):
+    """Inheritance patterns encoded as ints for cheap dispatch in hot loops"""
+    DOMINANT = 0
+    RECESSIVE = 1
+    XLINKED = 2
+    MULTIFACTORIAL = 3
+    UNKNOWN = 4
+
+INHERITANCE_TYPE_NAMES = {
+    "dominant": InheritanceType.DOMINANT,
+    "recessive": InheritanceType.RECESSIVE,
+    "x-linked": InheritanceType.XLINKED,
+    "multifactorial": InheritanceType.MULTIFACTORIAL,
+}
+
 class Disease(BaseModel):
     id: str
     name: str
-    type: str  # dominant, recessive, x-linked, multifactorial
+    type: InheritanceType  # dominant, recessive, x-linked, multifactorial
     prevalence: float
     penetrance: float
     description: str
     color: str
 
+    @field_validator("type", mode="before")
+    @classmethod
+    def _coerce_type(cls, v):
+        # Incoming JSON uses the string names; unrecognized values keep the
+        # legacy fall-through behavior (flat prevalence) instead of a 422
+        if isinstance(v, str):
+            return INHERITANCE_TYPE_NAMES.get(v, InheritanceType.UNKNOWN)
+        return v
+
 class FamilyMember(BaseModel):
     id: str
     name: str
@@ -84,205 +123,541 @@ class ExplanationRequest(BaseModel):
     disease: Disease
     familyMembers: List[FamilyMember]
 
+class ExplanationBatchRequest(BaseModel):
+    requests: List[ExplanationRequest]
+
 # Ollama configuration
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
 
+def _new_ollama_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=OLLAMA_BASE_URL,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+    )
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """Return the shared Ollama client, creating it if startup hasn't run"""
+    client = getattr(app.state, "ollama", None)
+    if client is None or client.is_closed:
+        client = _new_ollama_client()
+        app.state.ollama = client
+    return client
+
+@app.on_event("startup")
+async def startup_event():
+    # One shared client for all Ollama calls: connections are pooled and
+    # kept alive instead of paying DNS + TCP/TLS setup per request
+    app.state.ollama = _new_ollama_client()
+
+    # Warm up Ollama so the first chat/explain request doesn't pay the
+    # model's disk-to-memory load time; if Ollama is down this is a no-op
+    # and /health will report it as disconnected
+    try:
+        await app.state.ollama.post("/api/generate", json={
+            "model": OLLAMA_MODEL,
+            "prompt": "hi",
+            "stream": False,
+            "options": {"num_predict": 1}
+        })
+        logger.info(f"Preloaded Ollama model {OLLAMA_MODEL}")
+    except Exception as e:
+        logger.warning(f"Ollama model preload skipped: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await app.state.ollama.aclose()
+
+# Families above this many (member, disease) pairs are scored with the
+# vectorized NumPy kernel instead of the per-pair scalar calculators
+VECTORIZE_THRESHOLD = 256
+
+# Explanation templates keyed by (has_self, affected-parent bucket);
+# %-formatting a prebuilt template is cheaper than branching f-strings
+EXPLANATION_TEMPLATES = {
+    (True, 0): "%(name)s currently has %(disease)s.",
+    (False, 0): "No family history of %(disease)s. Risk based on general population prevalence.",
+    (False, 1): "One parent has %(disease)s. %(pattern)s inheritance increases risk.",
+    (False, 2): "Both parents have %(disease)s. Significantly elevated risk due to %(pattern)s inheritance.",
+}
+
 # Genetic simulation logic
 class GeneticSimulator:
     @staticmethod
-    def calculate_dominant_risk(member: FamilyMember, disease: Disease, family_members: List[FamilyMember]) -> float:
+    def precompute(family_members: List[FamilyMember]) -> Dict[str, Any]:
+        """Precompute lookup structures shared by all risk calculations.
+
+        Builds parent/sibling adjacency and per-member affected-disease sets
+        in a single pass so the per-(member, disease) calculators can use
+        O(1) lookups instead of re-scanning the whole family each call.
+        """
+        id_to_member = {m.id: m for m in family_members}
+
+        # dict.fromkeys drops duplicate parent ids while keeping order, so a
+        # parent listed twice isn't double-counted as "both parents affected"
+        parents_by_id = {
+            m.id: [id_to_member[p] for p in dict.fromkeys(m.parentIds) if p in id_to_member]
+            for m in family_members
+        }
+
+        # Group members sharing the same parents to derive siblings. Parent
+        # tuples are sorted so ordering differences don't split a sibship,
+        # and members without parents get no siblings (grouping all roots
+        # together would make unrelated founders count as siblings).
+        parent_groups: Dict[tuple, List[FamilyMember]] = {}
+        for m in family_members:
+            if m.parentIds:
+                parent_groups.setdefault(tuple(sorted(set(m.parentIds))), []).append(m)
+        siblings_by_id = {
+            m.id: ([s for s in parent_groups[tuple(sorted(set(m.parentIds)))] if s.id != m.id]
+                   if m.parentIds else [])
+            for m in family_members
+        }
+
+        affected_ids_by_member = {
+            m.id: frozenset(d.id for d in m.diseases) for m in family_members
+        }
+
+        return {
+            "id_to_member": id_to_member,
+            "parents_by_id": parents_by_id,
+            "siblings_by_id": siblings_by_id,
+            "affected_ids_by_member": affected_ids_by_member,
+        }
+
+    # The pattern calculators below are pure functions over primitives so
+    # whole (member, disease) results can be memoized by signature:
+    # `parents` is a tuple of (gender, affected) pairs, `siblings` a tuple
+    # of affected flags, both for the current disease only.
+
+    @staticmethod
+    def calculate_dominant_risk(has_self: bool, age: int, gender: str,
+                                parents: tuple, siblings: tuple,
+                                prevalence: float, penetrance: float) -> float:
         """Calculate risk for dominant inheritance pattern"""
-        if any(d.id == disease.id for d in member.diseases):
+        if has_self:
             return 1.0
-        
-        parents = [m for m in family_members if m.id in member.parentIds]
-        affected_parents = sum(1 for parent in parents if any(d.id == disease.id for d in parent.diseases))
-        
+
+        affected_parents = sum(1 for _, aff in parents if aff)
+
         if affected_parents == 0:
-            return disease.prevalence
+            return prevalence
         elif affected_parents == 1:
-            return 0.5 * disease.penetrance
+            return 0.5 * penetrance
         else:  # both parents affected
-            return 0.75 * disease.penetrance
-    
+            return 0.75 * penetrance
+
     @staticmethod
-    def calculate_recessive_risk(member: FamilyMember, disease: Disease, family_members: List[FamilyMember]) -> float:
+    def calculate_recessive_risk(has_self: bool, age: int, gender: str,
+                                 parents: tuple, siblings: tuple,
+                                 prevalence: float, penetrance: float) -> float:
         """Calculate risk for recessive inheritance pattern"""
-        if any(d.id == disease.id for d in member.diseases):
+        if has_self:
             return 1.0
-        
-        parents = [m for m in family_members if m.id in member.parentIds]
-        affected_parents = sum(1 for parent in parents if any(d.id == disease.id for d in parent.diseases))
-        
+
+        affected_parents = sum(1 for _, aff in parents if aff)
+
         # Simplified recessive calculation
         if affected_parents == 0:
-            return disease.prevalence
+            return prevalence
         elif affected_parents == 1:
-            return 0.25 * disease.penetrance  # Carrier risk
+            return 0.25 * penetrance  # Carrier risk
         else:  # both parents affected
-            return disease.penetrance
-    
+            return penetrance
+
     @staticmethod
-    def calculate_xlinked_risk(member: FamilyMember, disease: Disease, family_members: List[FamilyMember]) -> float:
+    def calculate_xlinked_risk(has_self: bool, age: int, gender: str,
+                               parents: tuple, siblings: tuple,
+                               prevalence: float, penetrance: float) -> float:
         """Calculate risk for X-linked inheritance pattern"""
-        if any(d.id == disease.id for d in member.diseases):
+        if has_self:
             return 1.0
-        
-        parents = [m for m in family_members if m.id in member.parentIds]
-        mother = next((p for p in parents if p.gender == 'female'), None)
-        father = next((p for p in parents if p.gender == 'male'), None)
-        
-        if member.gender == 'male':
-            # Males inherit X chromosome from mother
-            if mother and any(d.id == disease.id for d in mother.diseases):
-                return 0.5 * disease.penetrance
-            return disease.prevalence
+
+        if gender == 'male':
+            # Males inherit X chromosome from mother: any affected female
+            # parent confers carrier risk (not just the first one listed,
+            # which would make the result depend on parentIds order)
+            if any(aff for g, aff in parents if g == 'female'):
+                return 0.5 * penetrance
+            return prevalence
         else:
             # Females need two copies for expression (simplified)
-            affected_parents = sum(1 for parent in parents if any(d.id == disease.id for d in parent.diseases))
+            affected_parents = sum(1 for _, aff in parents if aff)
             if affected_parents == 2:
-                return disease.penetrance
+                return penetrance
             elif affected_parents == 1:
-                return 0.1 * disease.penetrance  # Carrier with mild expression
-            return disease.prevalence
-    
+                return 0.1 * penetrance  # Carrier with mild expression
+            return prevalence
+
     @staticmethod
-    def calculate_multifactorial_risk(member: FamilyMember, disease: Disease, family_members: List[FamilyMember]) -> float:
+    def calculate_multifactorial_risk(has_self: bool, age: int, gender: str,
+                                      parents: tuple, siblings: tuple,
+                                      prevalence: float, penetrance: float) -> float:
         """Calculate risk for multifactorial inheritance pattern"""
-        if any(d.id == disease.id for d in member.diseases):
+        if has_self:
             return 1.0
-        
-        # Count affected relatives
-        parents = [m for m in family_members if m.id in member.parentIds]
-        siblings = [m for m in family_members if m.parentIds == member.parentIds and m.id != member.id]
-        
-        affected_relatives = 0
-        total_weight = 0
-        
-        # Parents have higher weight
-        for parent in parents:
-            if any(d.id == disease.id for d in parent.diseases):
-                affected_relatives += 2
-            total_weight += 2
-        
-        # Siblings have moderate weight
-        for sibling in siblings:
-            if any(d.id == disease.id for d in sibling.diseases):
-                affected_relatives += 1
-            total_weight += 1
-        
+
+        # Parents weigh 2, siblings 1; the totals follow directly from the
+        # signature lengths, leaving one pass over the affected flags
+        total_weight = 2 * len(parents) + len(siblings)
         if total_weight == 0:
-            return disease.prevalence
-        
+            return prevalence
+
+        affected_relatives = 2 * sum(aff for _, aff in parents) + sum(siblings)
+
         family_loading = affected_relatives / total_weight
-        base_risk = disease.prevalence
-        
+        base_risk = prevalence
+
         # Age factor (simplified)
         age_factor = 1.0
-        if member.age > 50:
+        if age > 50:
             age_factor = 1.2
-        elif member.age < 30:
+        elif age < 30:
             age_factor = 0.8
-        
-        return min(base_risk + (family_loading * 0.3 * disease.penetrance * age_factor), 0.95)
-    
+
+        return min(base_risk + (family_loading * 0.3 * penetrance * age_factor), 0.95)
+
     @staticmethod
-    def calculate_risk(member: FamilyMember, disease: Disease, family_members: List[FamilyMember]) -> GeneticRisk:
-        """Calculate genetic risk for a member-disease pair"""
-        if disease.type == "dominant":
-            risk_score = GeneticSimulator.calculate_dominant_risk(member, disease, family_members)
-            pattern = "Autosomal Dominant"
-        elif disease.type == "recessive":
-            risk_score = GeneticSimulator.calculate_recessive_risk(member, disease, family_members)
-            pattern = "Autosomal Recessive"
-        elif disease.type == "x-linked":
-            risk_score = GeneticSimulator.calculate_xlinked_risk(member, disease, family_members)
-            pattern = "X-linked"
-        elif disease.type == "multifactorial":
-            risk_score = GeneticSimulator.calculate_multifactorial_risk(member, disease, family_members)
-            pattern = "Multifactorial"
-        else:
-            risk_score = disease.prevalence
-            pattern = "Unknown"
-        
-        # Generate explanation
-        parents = [m for m in family_members if m.id in member.parentIds]
-        affected_parents = [p for p in parents if any(d.id == disease.id for d in p.diseases)]
-        
-        if any(d.id == disease.id for d in member.diseases):
-            explanation = f"{member.name} currently has {disease.name}."
-        elif len(affected_parents) == 0:
-            explanation = f"No family history of {disease.name}. Risk based on general population prevalence."
-        elif len(affected_parents) == 1:
-            explanation = f"One parent has {disease.name}. {pattern} inheritance increases risk."
-        else:
-            explanation = f"Both parents have {disease.name}. Significantly elevated risk due to {pattern} inheritance."
-        
-        contributing_factors = []
-        if len(affected_parents) > 0:
-            contributing_factors.append(f"{len(affected_parents)} affected parent(s)")
-        if member.age > 50 and disease.type == "multifactorial":
-            contributing_factors.append("Advanced age")
-        
-        return GeneticRisk(
-            memberId=member.id,
-            diseaseId=disease.id,
-            riskScore=risk_score,
-            explanation=explanation,
-            inheritancePattern=pattern,
-            contributingFactors=contributing_factors
+    def calculate_unknown_risk(has_self: bool, age: int, gender: str,
+                               parents: tuple, siblings: tuple,
+                               prevalence: float, penetrance: float) -> float:
+        """Fallback for unrecognized inheritance types: flat prevalence"""
+        return prevalence
+
+    @staticmethod
+    def compute_risk_matrix(family_members: List[FamilyMember], diseases: List[Disease], pre: Dict[str, Any]) -> np.ndarray:
+        """Vectorized risk scores for all (member, disease) pairs.
+
+        Converts the family into columnar NumPy arrays and evaluates every
+        inheritance formula as a broadcast expression, so the per-pair math
+        runs in C instead of the interpreter. Returns an (M, D) float array
+        matching the scalar calculators exactly.
+        """
+        M = len(family_members)
+        D = len(diseases)
+        member_index = {m.id: i for i, m in enumerate(family_members)}
+        disease_index = {d.id: j for j, d in enumerate(diseases)}
+
+        # affected[i, j] = 1 if member i currently has disease j
+        affected = np.zeros((M, D), dtype=np.uint8)
+        for i, m in enumerate(family_members):
+            for disease_id in pre["affected_ids_by_member"][m.id]:
+                j = disease_index.get(disease_id)
+                if j is not None:
+                    affected[i, j] = 1
+
+        # Relationship masks: row i marks the relatives of member i
+        parent_mask = np.zeros((M, M), dtype=np.uint8)
+        mother_mask = np.zeros((M, M), dtype=np.uint8)
+        sibling_mask = np.zeros((M, M), dtype=np.uint8)
+        for i, m in enumerate(family_members):
+            for p in pre["parents_by_id"][m.id]:
+                parent_mask[i, member_index[p.id]] = 1
+                if p.gender == 'female':
+                    mother_mask[i, member_index[p.id]] = 1
+            for s in pre["siblings_by_id"][m.id]:
+                sibling_mask[i, member_index[s.id]] = 1
+
+        # One matmul each: (M, D) counts of affected relatives per pair
+        affected_int = affected.astype(np.int64)
+        ap = parent_mask.astype(np.int64) @ affected_int
+        # Any affected female parent, same as the scalar x-linked calculator
+        mother_affected = (mother_mask.astype(np.int64) @ affected_int) > 0
+        affected_siblings = sibling_mask.astype(np.int64) @ affected_int
+        n_parents = parent_mask.sum(axis=1, dtype=np.int64)[:, None]
+        n_siblings = sibling_mask.sum(axis=1, dtype=np.int64)[:, None]
+
+        prevalence = np.array([d.prevalence for d in diseases], dtype=np.float64)
+        penetrance = np.array([d.penetrance for d in diseases], dtype=np.float64)
+        ages = np.array([m.age for m in family_members], dtype=np.float64)[:, None]
+        is_male = np.array([m.gender == 'male' for m in family_members])[:, None]
+
+        dominant = np.where(ap == 0, prevalence,
+                            np.where(ap == 1, 0.5 * penetrance, 0.75 * penetrance))
+        recessive = np.where(ap == 0, prevalence,
+                             np.where(ap == 1, 0.25 * penetrance, penetrance))
+        xlinked_male = np.where(mother_affected, 0.5 * penetrance, prevalence)
+        xlinked_female = np.where(ap == 2, penetrance,
+                                  np.where(ap == 1, 0.1 * penetrance, prevalence))
+        xlinked = np.where(is_male, xlinked_male, xlinked_female)
+
+        total_weight = 2 * n_parents + n_siblings
+        affected_relatives = 2 * ap + affected_siblings
+        family_loading = np.divide(affected_relatives, total_weight,
+                                   out=np.zeros((M, D), dtype=np.float64),
+                                   where=total_weight > 0)
+        age_factor = np.where(ages > 50, 1.2, np.where(ages < 30, 0.8, 1.0))
+        multifactorial = np.where(
+            total_weight == 0, prevalence,
+            np.minimum(prevalence + family_loading * 0.3 * penetrance * age_factor, 0.95)
+        )
+
+        by_type = {
+            InheritanceType.DOMINANT: dominant,
+            InheritanceType.RECESSIVE: recessive,
+            InheritanceType.XLINKED: xlinked,
+            InheritanceType.MULTIFACTORIAL: multifactorial,
+        }
+        # Members who already have a disease are at risk 1.0 for it; unknown
+        # inheritance types fall back to flat prevalence like the scalar path
+        scores = np.empty((M, D), dtype=np.float64)
+        for j, d in enumerate(diseases):
+            pattern_scores = by_type.get(d.type)
+            if pattern_scores is not None:
+                scores[:, j] = np.where(affected[:, j] == 1, 1.0, pattern_scores[:, j])
+            else:
+                scores[:, j] = d.prevalence
+        return scores
+
+    @staticmethod
+    def compute_risk_matrix_jit(family_members: List[FamilyMember], diseases: List[Disease], pre: Dict[str, Any]) -> np.ndarray:
+        """Score all (member, disease) pairs with the Numba kernel.
+
+        Flattens parent/sibling adjacency into CSR arrays (flat indices plus
+        per-member offsets) and hands everything to risk_kernels.compute_risks,
+        which runs compiled and parallel across members.
+        """
+        M = len(family_members)
+        D = len(diseases)
+        member_index = {m.id: i for i, m in enumerate(family_members)}
+        disease_index = {d.id: j for j, d in enumerate(diseases)}
+
+        affected = np.zeros((M, D), dtype=np.uint8)
+        for i, m in enumerate(family_members):
+            for disease_id in pre["affected_ids_by_member"][m.id]:
+                j = disease_index.get(disease_id)
+                if j is not None:
+                    affected[i, j] = 1
+
+        parent_indices = []
+        parent_offsets = np.zeros(M + 1, dtype=np.int64)
+        sibling_indices = []
+        sibling_offsets = np.zeros(M + 1, dtype=np.int64)
+        for i, m in enumerate(family_members):
+            parent_indices.extend(member_index[p.id] for p in pre["parents_by_id"][m.id])
+            parent_offsets[i + 1] = len(parent_indices)
+            sibling_indices.extend(member_index[s.id] for s in pre["siblings_by_id"][m.id])
+            sibling_offsets[i + 1] = len(sibling_indices)
+
+        # Kernel codes mirror InheritanceType values; unknown maps to -1
+        disease_types = np.array(
+            [-1 if d.type == InheritanceType.UNKNOWN else int(d.type) for d in diseases],
+            dtype=np.int8
+        )
+        prevalence = np.array([d.prevalence for d in diseases], dtype=np.float64)
+        penetrance = np.array([d.penetrance for d in diseases], dtype=np.float64)
+        ages = np.array([m.age for m in family_members], dtype=np.float64)
+        is_male = np.array([m.gender == 'male' for m in family_members])
+        is_female = np.array([m.gender == 'female' for m in family_members])
+
+        out = np.empty((M, D), dtype=np.float64)
+        risk_kernels.compute_risks(
+            disease_types, prevalence, penetrance, ages, is_male, is_female, affected,
+            np.array(parent_indices, dtype=np.int64), parent_offsets,
+            np.array(sibling_indices, dtype=np.int64), sibling_offsets, out
         )
+        return out
+
+    @staticmethod
+    def calculate_risk(member: FamilyMember, disease: Disease, pre: Dict[str, Any],
+                       risk_score: Optional[float] = None) -> GeneticRisk:
+        """Calculate genetic risk for a member-disease pair.
+
+        Reduces the pair to canonical primitive signatures and delegates to
+        the memoized builder, so identical inputs (repeated /api/explain
+        calls, unchanged subtrees across UI edits) skip the whole
+        computation. When `risk_score` is provided (from the vectorized
+        kernel), the cache is bypassed and only the explanation is built.
+        """
+        affected = pre["affected_ids_by_member"]
+        parents = pre["parents_by_id"].get(member.id, [])
+        siblings = pre["siblings_by_id"].get(member.id, [])
+
+        member_sig = (member.id, member.name, member.age, member.gender,
+                      disease.id in affected.get(member.id, ()))
+        disease_sig = (disease.id, disease.name, disease.type, disease.prevalence, disease.penetrance)
+        parents_sig = tuple((p.gender, disease.id in affected.get(p.id, ())) for p in parents)
+        siblings_sig = tuple(disease.id in affected.get(s.id, ()) for s in siblings)
+
+        if risk_score is None:
+            return _risk_cached(member_sig, disease_sig, parents_sig, siblings_sig)
+        return _build_risk(member_sig, disease_sig, parents_sig, siblings_sig, risk_score)
+
+# Risk calculators and display names indexed by InheritanceType value
+RISK_DISPATCH = (
+    GeneticSimulator.calculate_dominant_risk,
+    GeneticSimulator.calculate_recessive_risk,
+    GeneticSimulator.calculate_xlinked_risk,
+    GeneticSimulator.calculate_multifactorial_risk,
+    GeneticSimulator.calculate_unknown_risk,
+)
+PATTERN_NAMES = ("Autosomal Dominant", "Autosomal Recessive", "X-linked", "Multifactorial", "Unknown")
+
+def _build_risk(member_sig: tuple, disease_sig: tuple, parents_sig: tuple,
+                siblings_sig: tuple, risk_score: Optional[float]) -> GeneticRisk:
+    """Build a GeneticRisk from primitive signatures (score + explanation)"""
+    member_id, name, age, gender, has_self = member_sig
+    disease_id, disease_name, disease_type, prevalence, penetrance = disease_sig
+
+    pattern = PATTERN_NAMES[disease_type]
+    if risk_score is None:
+        risk_score = RISK_DISPATCH[disease_type](has_self, age, gender,
+                                                 parents_sig, siblings_sig,
+                                                 prevalence, penetrance)
+
+    n_affected_parents = sum(1 for _, aff in parents_sig if aff)
+    template = EXPLANATION_TEMPLATES[(has_self, 0 if has_self else min(n_affected_parents, 2))]
+    explanation = template % {"name": name, "disease": disease_name, "pattern": pattern}
+
+    contributing_factors = []
+    if n_affected_parents > 0:
+        contributing_factors.append(f"{n_affected_parents} affected parent(s)")
+    if age > 50 and disease_type == InheritanceType.MULTIFACTORIAL:
+        contributing_factors.append("Advanced age")
+
+    # model_construct skips field validation; these values are built from
+    # already-validated request models, so revalidating M*D times is waste
+    return GeneticRisk.model_construct(
+        memberId=member_id,
+        diseaseId=disease_id,
+        riskScore=risk_score,
+        explanation=explanation,
+        inheritancePattern=pattern,
+        contributingFactors=contributing_factors
+    )
+
+@functools.lru_cache(maxsize=4096)
+def _risk_cached(member_sig: tuple, disease_sig: tuple, parents_sig: tuple,
+                 siblings_sig: tuple) -> GeneticRisk:
+    """Memoized risk builder; safe because signatures capture every input"""
+    return _build_risk(member_sig, disease_sig, parents_sig, siblings_sig, None)
 
 # Ollama integration
 class OllamaService:
     @staticmethod
-    async def generate_response(prompt: str, context: str = "") -> str:
-        """Generate AI response using Ollama"""
+    async def _generate_with_client(client: httpx.AsyncClient, prompt: str, context: str = "") -> str:
+        """Generate one AI response using an existing httpx client"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                payload = {
-                    "model": OLLAMA_MODEL,
-                    "prompt": f"{context}\n\nUser: {prompt}\n\nAssistant:",
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "top_p": 0.9,
-                        "max_tokens": 500
-                    }
+            payload = {
+                "model": OLLAMA_MODEL,
+                "prompt": f"{context}\n\nUser: {prompt}\n\nAssistant:",
+                "stream": False,
+                "options": {
+                    "temperature": 0.7,
+                    "top_p": 0.9,
+                    "max_tokens": 500
                 }
-                
-                response = await client.post(
-                    f"{OLLAMA_BASE_URL}/api/generate",
-                    json=payload
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get("response", "I apologize, but I couldn't generate a response at this time.")
-                else:
-                    logger.error(f"Ollama API error: {response.status_code}")
-                    return "I'm currently unable to connect to the AI service. Please try again later."
-                    
+            }
+
+            response = await client.post(
+                "/api/generate",
+                json=payload
+            )
+
+            if response.status_code == 200:
+                result = response.json()
+                return result.get("response", "I apologize, but I couldn't generate a response at this time.")
+            else:
+                logger.error(f"Ollama API error: {response.status_code}")
+                return "I'm currently unable to connect to the AI service. Please try again later."
+
         except Exception as e:
             logger.error(f"Error calling Ollama: {str(e)}")
             return "I'm experiencing technical difficulties. Please try again later."
+
+    @staticmethod
+    async def generate_response(prompt: str, context: str = "") -> str:
+        """Generate AI response using Ollama"""
+        return await OllamaService._generate_with_client(get_ollama_client(), prompt, context)
+
+    @staticmethod
+    async def generate_stream(prompt: str, context: str = ""):
+        """Stream AI response tokens from Ollama as they are generated.
+
+        Yields each token as soon as Ollama emits it, so callers can start
+        forwarding output at time-to-first-token instead of waiting for the
+        full completion.
+        """
+        payload = {
+            "model": OLLAMA_MODEL,
+            "prompt": f"{context}\n\nUser: {prompt}\n\nAssistant:",
+            "stream": True,
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "max_tokens": 500
+            }
+        }
+
+        try:
+            async with get_ollama_client().stream("POST", "/api/generate", json=payload) as response:
+                if response.status_code != 200:
+                    logger.error(f"Ollama API error: {response.status_code}")
+                    yield "I'm currently unable to connect to the AI service. Please try again later."
+                    return
+
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get("response")
+                    if token:
+                        yield token
+                    if chunk.get("done"):
+                        break
+
+        except Exception as e:
+            logger.error(f"Error streaming from Ollama: {str(e)}")
+            yield "I'm experiencing technical difficulties. Please try again later."
+
+    @staticmethod
+    async def generate_many(pairs: List[Tuple[str, str]], concurrency: int = 8) -> List[str]:
+        """Generate AI responses for many (prompt, context) pairs concurrently.
+
+        Fans all requests out with asyncio.gather over one shared client,
+        bounded by a semaphore so large batches don't flood Ollama. Set
+        OLLAMA_NUM_PARALLEL > 1 on the Ollama server so it can actually
+        serve the fan-out in parallel.
+        """
+        sem = asyncio.Semaphore(concurrency)
+        client = get_ollama_client()
+
+        async def _one(prompt: str, context: str) -> str:
+            async with sem:
+                return await OllamaService._generate_with_client(client, prompt, context)
+
+        return list(await asyncio.gather(*(_one(p, c) for p, c in pairs)))
     
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _build_context(member_rows: tuple, selected_name: Optional[str]) -> str:
+        """Assemble the context string from hashable member rows"""
+        parts = ["Family Tree Context:\n"]
+
+        for name, gender, age, disease_names in member_rows:
+            diseases_str = ", ".join(disease_names) if disease_names else "None"
+            parts.append(f"- {name} ({gender}, age {age}): Conditions: {diseases_str}\n")
+
+        if selected_name:
+            parts.append(f"\nCurrently discussing: {selected_name}\n")
+
+        parts.append("\nYou are a genetic counselor AI assistant helping to explain hereditary disease risks in families. Provide clear, accurate, and empathetic explanations.")
+
+        return "".join(parts)
+
     @staticmethod
     def build_family_context(family_members: List[FamilyMember], selected_member: Optional[FamilyMember] = None) -> str:
-        """Build context about the family for AI responses"""
-        context = "Family Tree Context:\n"
-        
-        for member in family_members:
-            diseases_str = ", ".join([d.name for d in member.diseases]) if member.diseases else "None"
-            context += f"- {member.name} ({member.gender}, age {member.age}): Conditions: {diseases_str}\n"
-        
-        if selected_member:
-            context += f"\nCurrently discussing: {selected_member.name}\n"
-        
-        context += "\nYou are a genetic counselor AI assistant helping to explain hereditary disease risks in families. Provide clear, accurate, and empathetic explanations."
-        
-        return context
+        """Build context about the family for AI responses.
+
+        The family is reduced to a hashable key so repeated chat turns over
+        an unchanged family hit the LRU cache instead of re-serializing.
+        """
+        member_rows = tuple(
+            (m.name, m.gender, m.age, tuple(d.name for d in m.diseases))
+            for m in family_members
+        )
+        return OllamaService._build_context(member_rows, selected_member.name if selected_member else None)
 
 # API Routes
 @app.get("/")
@@ -293,10 +668,9 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     try:
-        # Test Ollama connection
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{OLLAMA_BASE_URL}/api/tags")
-            ollama_status = "connected" if response.status_code == 200 else "disconnected"
+        # Test Ollama connection via the shared client
+        response = await get_ollama_client().get("/api/tags", timeout=5.0)
+        ollama_status = "connected" if response.status_code == 200 else "disconnected"
     except:
         ollama_status = "disconnected"
     
@@ -309,148 +683,282 @@ async def health_check():
         }
     }
 
+def _simulate(request: SimulationRequest) -> SimulationResult:
+    """Run the full simulation synchronously (called from a worker thread)"""
+    risks = []
+    pre = GeneticSimulator.precompute(request.familyMembers)
+
+    # Large families: score every pair at once with the NumPy kernel,
+    # keeping the scalar path only for explanation formatting
+    scores = None
+    if len(request.familyMembers) * len(request.diseases) > VECTORIZE_THRESHOLD:
+        if risk_kernels is not None:
+            scores = GeneticSimulator.compute_risk_matrix_jit(request.familyMembers, request.diseases, pre)
+        else:
+            scores = GeneticSimulator.compute_risk_matrix(request.familyMembers, request.diseases, pre)
+
+    for i, member in enumerate(request.familyMembers):
+        for j, disease in enumerate(request.diseases):
+            risk = GeneticSimulator.calculate_risk(
+                member, disease, pre,
+                risk_score=float(scores[i, j]) if scores is not None else None
+            )
+            risks.append(risk)
+
+    # Generate summary statistics in one vectorized pass; the fast path
+    # already has the score matrix, otherwise gather scores once
+    if scores is not None:
+        score_arr = scores.ravel()
+    else:
+        score_arr = np.fromiter((r.riskScore for r in risks), dtype=np.float64, count=len(risks))
+
+    high_risk_count = int((score_arr >= 0.7).sum())
+    moderate_risk_count = int(((score_arr >= 0.3) & (score_arr < 0.7)).sum())
+
+    summary = {
+        "totalRisks": len(risks),
+        "highRiskCount": high_risk_count,
+        "moderateRiskCount": moderate_risk_count,
+        "lowRiskCount": len(risks) - high_risk_count - moderate_risk_count,
+        "averageRisk": float(score_arr.mean()) if score_arr.size else 0
+    }
+
+    return SimulationResult(
+        risks=risks,
+        summary=summary,
+        timestamp=datetime.now().isoformat()
+    )
+
 @app.post("/api/simulate", response_model=SimulationResult)
 async def run_simulation(request: SimulationRequest):
     """Run genetic risk simulation"""
     try:
-        risks = []
-        
-        for member in request.familyMembers:
-            for disease in request.diseases:
-                risk = GeneticSimulator.calculate_risk(member, disease, request.familyMembers)
-                risks.append(risk)
-        
-        # Generate summary statistics
-        high_risk_count = sum(1 for risk in risks if risk.riskScore >= 0.7)
-        moderate_risk_count = sum(1 for risk in risks if 0.3 <= risk.riskScore < 0.7)
-        
-        summary = {
-            "totalRisks": len(risks),
-            "highRiskCount": high_risk_count,
-            "moderateRiskCount": moderate_risk_count,
-            "lowRiskCount": len(risks) - high_risk_count - moderate_risk_count,
-            "averageRisk": sum(risk.riskScore for risk in risks) / len(risks) if risks else 0
-        }
-        
-        return SimulationResult(
-            risks=risks,
-            summary=summary,
-            timestamp=datetime.now().isoformat()
-        )
-        
+        # CPU-bound work runs on a worker thread so the event loop stays
+        # free for concurrent chat/health requests
+        return await asyncio.to_thread(_simulate, request)
+
     except Exception as e:
         logger.error(f"Simulation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Simulation failed: {str(e)}")
 
+def _trim_history(messages: List[ChatMessage], char_budget: int = 4000) -> str:
+    """Join the most recent messages that fit within a character budget.
+
+    Walks the history newest-first and stops at the budget, so long
+    conversations keep the freshest turns instead of a fixed count that
+    can blow past the model's context window (Ollama silently truncates
+    over-long prompts, wasting compute on tokens it then drops).
+    """
+    kept = []
+    used = 0
+
+    for msg in reversed(messages):
+        line = f"{msg.role.title()}: {msg.content}\n"
+        if used + len(line) > char_budget:
+            break
+        kept.append(line)
+        used += len(line)
+
+    return "".join(reversed(kept))
+
+def build_chat_context(request: ChatRequest) -> str:
+    """Build the full chat context: family tree plus recent history"""
+    context = OllamaService.build_family_context(request.familyMembers, request.selectedMember)
+
+    # Add as much recent chat history as the budget allows
+    if request.chatHistory:
+        history = _trim_history(request.chatHistory)
+        if history:
+            context += "\n\nPrevious conversation:\n" + history
+
+    return context
+
 @app.post("/api/chat")
 async def chat_with_ai(request: ChatRequest):
     """Chat with AI about genetic risks"""
     try:
-        context = OllamaService.build_family_context(request.familyMembers, request.selectedMember)
-        
-        # Add chat history to context
-        if request.chatHistory:
-            context += "\n\nPrevious conversation:\n"
-            for msg in request.chatHistory[-5:]:  # Last 5 messages for context
-                context += f"{msg.role.title()}: {msg.content}\n"
-        
+        context = build_chat_context(request)
         response = await OllamaService.generate_response(request.message, context)
-        
+
         return {
             "response": response,
             "timestamp": datetime.now().isoformat()
         }
-        
+
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
+@app.post("/api/chat/stream")
+async def chat_with_ai_stream(request: ChatRequest):
+    """Chat with AI, streaming the response as server-sent events.
+
+    Tokens are forwarded as they arrive from Ollama, so clients see output
+    at time-to-first-token; /api/chat remains for clients that can't
+    consume SSE.
+    """
+    context = build_chat_context(request)
+
+    async def event_stream():
+        async for token in OllamaService.generate_stream(request.message, context):
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+def _family_including(member: FamilyMember, family_members: List[FamilyMember]) -> List[FamilyMember]:
+    """Family list with `member` appended when not already present.
+
+    Explanation requests carry the member separately from the family, and
+    nothing guarantees membership; precompute() resolves everything by id,
+    so an absent member would otherwise score as having no history at all.
+    """
+    if any(m.id == member.id for m in family_members):
+        return family_members
+    return [*family_members, member]
+
+def build_explanation_prompt(member: FamilyMember, disease: Disease, risk: GeneticRisk) -> str:
+    """Build the AI prompt for explaining a single calculated risk"""
+    return f"""Explain why {member.name} has a {risk.riskScore*100:.1f}% risk of developing {disease.name}.
+
+Consider:
+        - The {risk.inheritancePattern} inheritance pattern
+        - Family history and affected relatives
+        - Age and other risk factors
+        - Provide reassurance and practical advice
+
+Keep the explanation clear, empathetic, and under 200 words."""
+
 @app.post("/api/explain")
 async def get_personalized_explanation(request: ExplanationRequest):
     """Get personalized AI explanation for a specific risk"""
     try:
         # Calculate the risk first
-        risk = GeneticSimulator.calculate_risk(request.member, request.disease, request.familyMembers)
-        
+        pre = GeneticSimulator.precompute(_family_including(request.member, request.familyMembers))
+        risk = GeneticSimulator.calculate_risk(request.member, request.disease, pre)
+
         # Build detailed context for explanation
         context = OllamaService.build_family_context(request.familyMembers, request.member)
-        
-        prompt = f"""Explain why {request.member.name} has a {risk.riskScore*100:.1f}% risk of developing {request.disease.name}. 
-        
-Consider:
-        - The {risk.inheritancePattern} inheritance pattern
-        - Family history and affected relatives
-        - Age and other risk factors
-        - Provide reassurance and practical advice
-        
-Keep the explanation clear, empathetic, and under 200 words."""
-        
+        prompt = build_explanation_prompt(request.member, request.disease, risk)
+
         explanation = await OllamaService.generate_response(prompt, context)
-        
+
         return {
             "explanation": explanation,
             "riskScore": risk.riskScore,
             "inheritancePattern": risk.inheritancePattern,
             "timestamp": datetime.now().isoformat()
         }
-        
+
     except Exception as e:
         logger.error(f"Explanation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Explanation failed: {str(e)}")
 
+@app.post("/api/explain_batch")
+async def get_personalized_explanations_batch(request: ExplanationBatchRequest):
+    """Get personalized AI explanations for several risks in one call.
+
+    Collapses N client round-trips into one request; the upstream Ollama
+    calls are fanned out concurrently via OllamaService.generate_many.
+    """
+    try:
+        risks = []
+        pairs = []
+        for item in request.requests:
+            pre = GeneticSimulator.precompute(_family_including(item.member, item.familyMembers))
+            risk = GeneticSimulator.calculate_risk(item.member, item.disease, pre)
+            context = OllamaService.build_family_context(item.familyMembers, item.member)
+            prompt = build_explanation_prompt(item.member, item.disease, risk)
+            risks.append(risk)
+            pairs.append((prompt, context))
+
+        explanations = await OllamaService.generate_many(pairs)
+
+        timestamp = datetime.now().isoformat()
+        return {
+            "explanations": [
+                {
+                    "explanation": explanation,
+                    "riskScore": risk.riskScore,
+                    "inheritancePattern": risk.inheritancePattern,
+                    "timestamp": timestamp
+                }
+                for explanation, risk in zip(explanations, risks)
+            ]
+        }
+
+    except Exception as e:
+        logger.error(f"Batch explanation error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch explanation failed: {str(e)}")
+
+# Static disease catalog - this would typically come from a database.
+# Serialized once at import; the endpoint just returns the cached bytes.
+DISEASES = [
+    {
+        "id": "huntington",
+        "name": "Huntington's Disease",
+        "type": "dominant",
+        "prevalence": 0.0001,
+        "penetrance": 0.95,
+        "description": "A progressive brain disorder caused by a defective gene.",
+        "color": "#ef4444"
+    },
+    {
+        "id": "cystic-fibrosis",
+        "name": "Cystic Fibrosis",
+        "type": "recessive",
+        "prevalence": 0.0004,
+        "penetrance": 0.99,
+        "description": "A genetic disorder affecting the lungs and digestive system.",
+        "color": "#3b82f6"
+    },
+    {
+        "id": "color-blindness",
+        "name": "Color Blindness",
+        "type": "x-linked",
+        "prevalence": 0.08,
+        "penetrance": 0.95,
+        "description": "Difficulty distinguishing certain colors.",
+        "color": "#10b981"
+    },
+    {
+        "id": "diabetes-t2",
+        "name": "Type 2 Diabetes",
+        "type": "multifactorial",
+        "prevalence": 0.11,
+        "penetrance": 0.8,
+        "description": "A chronic condition affecting blood sugar regulation.",
+        "color": "#f59e0b"
+    },
+    {
+        "id": "heart-disease",
+        "name": "Coronary Heart Disease",
+        "type": "multifactorial",
+        "prevalence": 0.06,
+        "penetrance": 0.7,
+        "description": "Disease of the blood vessels supplying the heart.",
+        "color": "#ef4444"
+    }
+]
+
+DISEASES_JSON = orjson.dumps({"diseases": DISEASES})
+DISEASES_ETAG = hashlib.md5(DISEASES_JSON).hexdigest()
+
 @app.get("/api/diseases")
 async def get_diseases():
     """Get list of available diseases"""
-    # This would typically come from a database
-    diseases = [
-        {
-            "id": "huntington",
-            "name": "Huntington's Disease",
-            "type": "dominant",
-            "prevalence": 0.0001,
-            "penetrance": 0.95,
-            "description": "A progressive brain disorder caused by a defective gene.",
-            "color": "#ef4444"
-        },
-        {
-            "id": "cystic-fibrosis",
-            "name": "Cystic Fibrosis",
-            "type": "recessive",
-            "prevalence": 0.0004,
-            "penetrance": 0.99,
-            "description": "A genetic disorder affecting the lungs and digestive system.",
-            "color": "#3b82f6"
-        },
-        {
-            "id": "color-blindness",
-            "name": "Color Blindness",
-            "type": "x-linked",
-            "prevalence": 0.08,
-            "penetrance": 0.95,
-            "description": "Difficulty distinguishing certain colors.",
-            "color": "#10b981"
-        },
-        {
-            "id": "diabetes-t2",
-            "name": "Type 2 Diabetes",
-            "type": "multifactorial",
-            "prevalence": 0.11,
-            "penetrance": 0.8,
-            "description": "A chronic condition affecting blood sugar regulation.",
-            "color": "#f59e0b"
-        },
-        {
-            "id": "heart-disease",
-            "name": "Coronary Heart Disease",
-            "type": "multifactorial",
-            "prevalence": 0.06,
-            "penetrance": 0.7,
-            "description": "Disease of the blood vessels supplying the heart.",
-            "color": "#ef4444"
-        }
-    ]
-    
-    return {"diseases": diseases}
+    return Response(
+        content=DISEASES_JSON,
+        media_type="application/json",
+        headers={"ETag": DISEASES_ETAG}
+    )
+
+@app.post("/api/cache/clear")
+async def clear_caches():
+    """Clear server-side memoization caches (admin)"""
+    _risk_cached.cache_clear()
+    OllamaService._build_context.cache_clear()
+    return {"status": "cleared", "timestamp": datetime.now().isoformat()}
 
 @app.post("/api/export")
 async def export_family_data(family_data: Dict[str, Any]):
@@ -471,4 +979,14 @@ async def export_family_data(family_data: Dict[str, Any]):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+
+    # uvloop and httptools (bundled with uvicorn[standard]) cut event-loop
+    # and HTTP-parsing overhead for every request. reload and multi-worker
+    # mode are mutually exclusive, so workers are gated behind PROD=1.
+    if os.getenv("PROD") == "1":
+        uvicorn.run("main:app", host="0.0.0.0", port=8000,
+                    loop="uvloop", http="httptools",
+                    workers=min(4, os.cpu_count() or 1))
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True,
+                    loop="uvloop", http="httptools")
\ No newline at end of file